@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import os
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
 from typing import List
 
 from .auth import ApiKeyStore, get_auth_mode, get_current_principal, mint_api_key
@@ -18,9 +22,6 @@ from .registry import ToolRegistry
 
 router = APIRouter()
 
-def pyd_schema(model):
-    return model.model_json_schema()
-
 def build_mcp_router(registry: ToolRegistry, *, server_name: str, server_description: str) -> APIRouter:
     r = APIRouter()
 
@@ -32,7 +33,7 @@ def build_mcp_router(registry: ToolRegistry, *, server_name: str, server_descrip
     @r.get("/mcp/list_tools", response_model=List[ToolListItem])
     async def list_tools(principal: Principal = Depends(get_current_principal)):
         registry.authorize_action(principal, "tools:list")
-        return [ToolListItem(name=t.name, description=t.description) for t in registry.list()]
+        return Response(registry.list_tools_json(), media_type="application/json")
 
     @r.post("/mcp/get_tool", response_model=GetToolResponse)
     async def get_tool(req: GetToolRequest, principal: Principal = Depends(get_current_principal)):
@@ -41,7 +42,7 @@ def build_mcp_router(registry: ToolRegistry, *, server_name: str, server_descrip
             t = registry.get(req.name)
         except KeyError:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tool not found")
-        return GetToolResponse(name=t.name, docstring=(t.fn.__doc__ or ""), input_schema=pyd_schema(t.input_model))
+        return GetToolResponse(name=t.name, docstring=t.docstring, input_schema=t.input_schema)
 
     @r.post("/mcp/call_tool", response_model=CallToolResponse)
     async def call_tool(req: CallToolRequest, principal: Principal = Depends(get_current_principal)):
@@ -58,6 +59,14 @@ def build_mcp_router(registry: ToolRegistry, *, server_name: str, server_descrip
 
 # --- Optional token minting API (disabled unless explicitly enabled) ---
 
+@lru_cache(maxsize=1)
+def _mint_enabled() -> bool:
+    return os.getenv("DYNAMIC_MCP_ENABLE_MINT", "0") == "1"
+
+@lru_cache(maxsize=1)
+def _admin_token() -> str:
+    return os.getenv("DYNAMIC_MCP_ADMIN_TOKEN", "")
+
 def build_auth_router() -> APIRouter:
     r = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -77,22 +86,20 @@ def build_auth_router() -> APIRouter:
         This is intentionally minimal. In production, prefer minting via CLI or an external IAM system.
         To enable this endpoint, set DYNAMIC_MCP_ENABLE_MINT=1 and provide DYNAMIC_MCP_ADMIN_TOKEN.
         """
-        if os.getenv("DYNAMIC_MCP_ENABLE_MINT", "0") != "1":
+        if not _mint_enabled():
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
 
-        expected = os.getenv("DYNAMIC_MCP_ADMIN_TOKEN", "")
+        expected = _admin_token()
         if not expected or admin_token != expected:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
         if get_auth_mode() != "apikey":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Minting only supported in apikey mode")
 
-        from datetime import timedelta, datetime, timezone
         expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
         token = mint_api_key(principal_id=principal_id, capabilities=capabilities, expires_at=expires_at)
         return Token(access_token=token)
 
     return r
 
-import os
 auth_router = build_auth_router()
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
 import hashlib
+import asyncio
 import hmac
 import json
 import os
 import secrets
+import threading
+import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
+import orjson
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
@@ -18,6 +23,12 @@ from .models import Principal
 AUTH_MODE_ENV = "DYNAMIC_MCP_AUTH_MODE"  # none | apikey | external
 APIKEY_STORE_ENV = "DYNAMIC_MCP_APIKEY_STORE"  # path to json store
 APIKEY_HMAC_SECRET_ENV = "DYNAMIC_MCP_APIKEY_HMAC_SECRET"  # required for apikey mode
+APIKEY_TRACK_LAST_USED_ENV = "DYNAMIC_MCP_APIKEY_TRACK_LAST_USED"  # 0 disables last_used_at writes
+
+# How often buffered last_used_at updates are written back to the key store.
+LAST_USED_FLUSH_SECONDS = 30.0
+# How often an unknown token may trigger a check of the store file for newly minted keys.
+UNKNOWN_KEY_RECHECK_SECONDS = 1.0
 
 # External auth headers
 EXT_PRINCIPAL_HEADER = "X-MCP-Principal"
@@ -29,15 +40,25 @@ bearer = HTTPBearer(auto_error=False)
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
+# Environment-derived settings are read once, on first use rather than at import,
+# so that callers can still populate the environment (e.g. load_dotenv) after
+# importing dynamic_mcp.
+@lru_cache(maxsize=1)
 def get_auth_mode() -> str:
     return os.getenv(AUTH_MODE_ENV, "apikey").strip().lower()
 
+@lru_cache(maxsize=1)
 def _store_path() -> Path:
     p = os.getenv(APIKEY_STORE_ENV)
     if p:
         return Path(p).expanduser().resolve()
     return (Path.home() / ".dynamic_mcp" / "apikeys.json").resolve()
 
+@lru_cache(maxsize=1)
+def _track_last_used() -> bool:
+    return os.getenv(APIKEY_TRACK_LAST_USED_ENV, "1") != "0"
+
+@lru_cache(maxsize=1)
 def _hmac_secret() -> bytes:
     s = os.getenv(APIKEY_HMAC_SECRET_ENV, "")
     if not s:
@@ -46,8 +67,15 @@ def _hmac_secret() -> bytes:
         )
     return s.encode("utf-8")
 
+@lru_cache(maxsize=4)
+def _hmac_template(secret: bytes) -> hmac.HMAC:
+    # Keyed once; copies skip re-deriving the inner/outer pads per token.
+    return hmac.new(secret, digestmod=hashlib.sha256)
+
 def _hmac_digest(token: str, secret: bytes) -> str:
-    return hmac.new(secret, token.encode("utf-8"), hashlib.sha256).hexdigest()
+    h = _hmac_template(secret).copy()
+    h.update(token.encode("utf-8"))
+    return h.hexdigest()
 
 @dataclass
 class StoredKey:
@@ -61,22 +89,92 @@ class StoredKey:
     revoked_at: Optional[str] = None
     last_used_at: Optional[str] = None
 
+def _index_by_hmac(db: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    # First record wins if a token_hmac was ever stored twice.
+    index: Dict[str, Dict[str, Any]] = {}
+    for k in db.get("keys", []):
+        index.setdefault(k.get("token_hmac"), k)
+    return index
+
 class ApiKeyStore:
-    """Simple JSON-backed store for opaque API keys."""
+    """Simple JSON-backed store for opaque API keys.
+
+    The parsed file is kept in memory and only re-read when its mtime changes,
+    so resolving a key is a dict lookup rather than a parse of the whole store.
+    """
 
     def __init__(self, path: Path):
         self.path = path
+        self._db: Dict[str, Any] = {"keys": []}
+        self._by_hmac: Dict[str, Dict[str, Any]] = {}
+        self._mtime: Optional[int] = None
+        # token_hmac -> last_used_at, flushed to disk at most every LAST_USED_FLUSH_SECONDS
+        self._pending_last_used: Dict[str, str] = {}
+        self._last_flush = time.monotonic()
+        self._last_miss_check = float("-inf")
+        # flush() runs in a worker thread; serializes it with the other read-modify-write paths.
+        self._write_lock = threading.Lock()
         self.path.parent.mkdir(parents=True, exist_ok=True)
         if not self.path.exists():
             self._write({"keys": []})
 
     def _read(self) -> Dict[str, Any]:
-        return json.loads(self.path.read_text())
+        mtime = self.path.stat().st_mtime_ns
+        if mtime != self._mtime:
+            self._db = orjson.loads(self.path.read_bytes())
+            self._by_hmac = _index_by_hmac(self._db)
+            self._mtime = mtime
+        return self._db
 
     def _write(self, obj: Dict[str, Any]) -> None:
-        self.path.write_text(json.dumps(obj, indent=2, sort_keys=True))
+        # Write a sibling file and rename it over the store, so a concurrent
+        # _read() (or another process) never parses a half-written file.
+        tmp = self.path.with_name(f".{self.path.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            tmp.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+            os.replace(tmp, self.path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        # Our own write is already reflected in memory; don't re-parse it on the next read.
+        self._db = obj
+        self._by_hmac = _index_by_hmac(obj)
+        self._mtime = self.path.stat().st_mtime_ns
+
+    def _touch_last_used(self, token_hmac: str, when: datetime) -> None:
+        if not _track_last_used():
+            return
+        self._pending_last_used[token_hmac] = when.isoformat()
+
+    def take_flush_due(self) -> bool:
+        """True when buffered updates are older than LAST_USED_FLUSH_SECONDS.
+
+        Claims the flush: later calls return False until the interval passes again.
+        """
+        now = time.monotonic()
+        if not self._pending_last_used or now - self._last_flush < LAST_USED_FLUSH_SECONDS:
+            return False
+        self._last_flush = now
+        return True
+
+    def flush(self) -> None:
+        """Persist pending `last_used_at` updates (best effort)."""
+        self._last_flush = time.monotonic()
+        if not self._pending_last_used:
+            return
+        pending, self._pending_last_used = self._pending_last_used, {}
+        try:
+            with self._write_lock:
+                db = self._read()
+                for token_hmac, used_at in pending.items():
+                    rec = self._by_hmac.get(token_hmac)
+                    if rec is not None:
+                        rec["last_used_at"] = used_at
+                self._write(db)
+        except Exception:
+            pass
 
-    def mint_key(
+    def _new_record(
         self,
         *,
         principal_id: str,
@@ -84,7 +182,7 @@ class ApiKeyStore:
         constraints: Optional[Dict[str, Any]] = None,
         expires_at: Optional[datetime] = None,
         prefix: str = "mcp_live_",
-    ) -> str:
+    ) -> Tuple[str, StoredKey]:
         # opaque token that the client will present
         token = prefix + secrets.token_urlsafe(32)
         secret = _hmac_secret()
@@ -101,68 +199,122 @@ class ApiKeyStore:
             revoked_at=None,
             last_used_at=None,
         )
+        return token, rec
 
-        db = self._read()
-        db["keys"].append(rec.__dict__)
-        self._write(db)
-        return token
+    def mint_key(
+        self,
+        *,
+        principal_id: str,
+        capabilities: List[str],
+        constraints: Optional[Dict[str, Any]] = None,
+        expires_at: Optional[datetime] = None,
+        prefix: str = "mcp_live_",
+    ) -> str:
+        return self.mint_many(
+            [
+                dict(
+                    principal_id=principal_id,
+                    capabilities=capabilities,
+                    constraints=constraints,
+                    expires_at=expires_at,
+                    prefix=prefix,
+                )
+            ]
+        )[0]
+
+    def mint_many(self, specs: List[Dict[str, Any]]) -> List[str]:
+        """Mint several keys with a single store write.
+
+        Each spec takes the same keyword arguments as `mint_key`.
+        """
+        minted = [self._new_record(**spec) for spec in specs]
+
+        with self._write_lock:
+            db = self._read()
+            db["keys"].extend(rec.__dict__ for _, rec in minted)
+            self._write(db)
+        return [token for token, _ in minted]
 
     def revoke(self, token: str) -> bool:
         secret = _hmac_secret()
         token_hmac = _hmac_digest(token, secret)
-        db = self._read()
-        changed = False
-        for k in db.get("keys", []):
-            if k.get("token_hmac") == token_hmac and not k.get("revoked_at"):
-                k["revoked_at"] = _utcnow().isoformat()
-                changed = True
-        if changed:
+        with self._write_lock:
+            db = self._read()
+            k = self._by_hmac.get(token_hmac)
+            if k is None or k.get("revoked_at"):
+                return False
+            k["revoked_at"] = _utcnow().isoformat()
             self._write(db)
-        return changed
+        return True
 
     def resolve(self, token: str) -> Principal:
         secret = _hmac_secret()
         token_hmac = _hmac_digest(token, secret)
-        db = self._read()
-        now = _utcnow()
 
-        for k in db.get("keys", []):
-            if k.get("token_hmac") != token_hmac:
-                continue
+        if token_hmac in self._by_hmac:
+            # Known key: re-check the file so external revocations apply immediately.
+            self._read()
+        else:
+            # Unknown tokens are rejected from memory. The file is only looked at
+            # (for keys minted by another process) at most once per
+            # UNKNOWN_KEY_RECHECK_SECONDS, so a flood of bad tokens causes no IO.
+            mono = time.monotonic()
+            if mono - self._last_miss_check < UNKNOWN_KEY_RECHECK_SECONDS:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+            self._last_miss_check = mono
+            self._read()
 
-            if k.get("revoked_at"):
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key revoked")
+        now = _utcnow()
+        k = self._by_hmac.get(token_hmac)
+        if k is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
 
-            exp = k.get("expires_at")
-            if exp:
-                try:
-                    exp_dt = datetime.fromisoformat(exp)
-                except Exception:
-                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key invalid expiry")
-                if exp_dt < now:
-                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key expired")
+        if k.get("revoked_at"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key revoked")
 
-            # update last_used_at (best effort)
-            k["last_used_at"] = now.isoformat()
+        exp = k.get("expires_at")
+        if exp:
             try:
-                self._write(db)
+                exp_dt = datetime.fromisoformat(exp)
             except Exception:
-                pass
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key invalid expiry")
+            if exp_dt < now:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key expired")
+
+        # update last_used_at (best effort, coalesced)
+        self._touch_last_used(token_hmac, now)
+
+        return Principal(
+            principal_id=k.get("principal_id", "unknown"),
+            capabilities=list(k.get("capabilities") or []),
+            constraints=dict(k.get("constraints") or {}),
+            disabled=False,
+        )
+
+@lru_cache(maxsize=1)
+def _get_store() -> ApiKeyStore:
+    # Built once and reused: the constructor touches the filesystem (mkdir/exists).
+    return ApiKeyStore(_store_path())
 
-            return Principal(
-                principal_id=k.get("principal_id", "unknown"),
-                capabilities=list(k.get("capabilities") or []),
-                constraints=dict(k.get("constraints") or {}),
-                disabled=False,
-            )
+def flush_api_key_store() -> None:
+    """Write out buffered `last_used_at` updates (called on app shutdown).
 
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+    Only a store that already served requests is flushed; none is created here.
+    """
+    if _get_store.cache_info().currsize:
+        _get_store().flush()
 
-def _principal_noauth() -> Principal:
+AuthHandler = Callable[[Request, Optional[HTTPAuthorizationCredentials]], Awaitable[Principal]]
+
+async def _principal_noauth(
+    request: Request, creds: Optional[HTTPAuthorizationCredentials]
+) -> Principal:
     # Explicitly wide-open: intended for localhost development only.
     return Principal(principal_id="anonymous", capabilities=["*"], constraints={}, disabled=False)
 
-def _principal_external(request: Request) -> Principal:
+async def _principal_external(
+    request: Request, creds: Optional[HTTPAuthorizationCredentials]
+) -> Principal:
     pid = request.headers.get(EXT_PRINCIPAL_HEADER, "").strip()
     if not pid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Missing {EXT_PRINCIPAL_HEADER}")
@@ -182,28 +334,46 @@ def _principal_external(request: Request) -> Principal:
 
     return Principal(principal_id=pid, capabilities=capabilities, constraints=constraints, disabled=False)
 
-def get_current_principal(
-    request: Request,
-    creds: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+async def _principal_apikey(
+    request: Request, creds: Optional[HTTPAuthorizationCredentials]
 ) -> Principal:
-    """FastAPI dependency returning the current Principal according to auth mode."""
-    mode = get_auth_mode()
+    if creds is None or creds.scheme.lower() != "bearer" or not creds.credentials:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
 
-    if mode == "none":
-        return _principal_noauth()
+    store = _get_store()
+    principal = store.resolve(creds.credentials)
+    if store.take_flush_due():
+        # flush() rewrites the whole store file; keep it off the event loop.
+        await asyncio.to_thread(store.flush)
+    return principal
 
-    if mode == "external":
-        return _principal_external(request)
+async def _principal_unknown_mode(
+    request: Request, creds: Optional[HTTPAuthorizationCredentials]
+) -> Principal:
+    raise HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Unknown auth mode: {get_auth_mode()}"
+    )
 
-    # default: apikey
-    if mode != "apikey":
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Unknown auth mode: {mode}")
+_MODE_HANDLERS: Dict[str, AuthHandler] = {
+    "none": _principal_noauth,
+    "external": _principal_external,
+    "apikey": _principal_apikey,
+}
 
-    if creds is None or creds.scheme.lower() != "bearer" or not creds.credentials:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
+@lru_cache(maxsize=1)
+def _mode_handler() -> AuthHandler:
+    return _MODE_HANDLERS.get(get_auth_mode(), _principal_unknown_mode)
+
+async def get_current_principal(
+    request: Request,
+    creds: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+) -> Principal:
+    """FastAPI dependency returning the current Principal according to auth mode.
 
-    store = ApiKeyStore(_store_path())
-    return store.resolve(creds.credentials)
+    Declared async so FastAPI runs it on the event loop instead of dispatching
+    to the threadpool; the key store only stats its file on the hot path.
+    """
+    return await _mode_handler()(request, creds)
 
 # Convenience helper for demos / admins:
 def mint_api_key(
@@ -214,8 +384,7 @@ def mint_api_key(
     expires_at: Optional[datetime] = None,
 ) -> str:
     """Mint and persist an API key in the JSON store (apikey mode)."""
-    store = ApiKeyStore(_store_path())
-    return store.mint_key(
+    return _get_store().mint_key(
         principal_id=principal_id,
         capabilities=capabilities,
         constraints=constraints,
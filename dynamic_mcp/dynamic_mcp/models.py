@@ -1,7 +1,34 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+import re
+from dataclasses import dataclass, field
+from fnmatch import translate
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Pattern
 from pydantic import BaseModel, Field
 
+_GLOB_CHARS = frozenset("*?[")
+
+def is_glob(pattern: str) -> bool:
+    return not _GLOB_CHARS.isdisjoint(pattern)
+
+class CapabilitySet:
+    """Capabilities compiled once for repeated matching (fnmatch semantics)."""
+
+    __slots__ = ("is_admin", "literals", "glob")
+
+    def __init__(self, capabilities: Iterable[str]):
+        caps = list(capabilities)
+        self.is_admin = "*" in caps or "admin:*" in caps
+        self.literals: FrozenSet[str] = frozenset(c for c in caps if not is_glob(c))
+        globs = [c for c in caps if is_glob(c)]
+        self.glob: Optional[Pattern[str]] = (
+            re.compile("|".join(translate(c) for c in globs)) if globs else None
+        )
+
+    def matches(self, required: str) -> bool:
+        if self.is_admin or required in self.literals:
+            return True
+        return self.glob is not None and self.glob.match(required) is not None
+
 class ToolListItem(BaseModel):
     name: str
     description: str
@@ -30,9 +57,18 @@ class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
-class Principal(BaseModel):
-    """Authenticated caller context."""
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Authenticated caller context.
+
+    A plain dataclass rather than a pydantic model: one is built per request
+    and it is never (de)serialized.
+    """
     principal_id: str
-    capabilities: List[str] = Field(default_factory=list)
-    constraints: Dict[str, Any] = Field(default_factory=dict)
+    capabilities: List[str] = field(default_factory=list)
+    constraints: Dict[str, Any] = field(default_factory=dict)
     disabled: bool = False
+    caps: CapabilitySet = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "caps", CapabilitySet(self.capabilities))
@@ -1,36 +1,141 @@
 from __future__ import annotations
 
 import inspect
+import re
 from dataclasses import dataclass
-from fnmatch import fnmatch
-from typing import Any, Callable, Dict, List, Optional, Type, get_type_hints
+from fnmatch import translate
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Pattern, Tuple, Type, get_type_hints
 
+import orjson
+from fastapi import HTTPException, status
 from pydantic import BaseModel, ValidationError, create_model
 
-from .models import Principal
+from .models import Principal, is_glob
 
 Handler = Callable[..., Any]
 
+# Scalar annotations whose JSON values can be passed through without pydantic
+# when they already have the right type (float also accepts ints, as pydantic does).
+_SIMPLE_TYPES = (int, float, str, bool, bytes)
+_MISSING = object()
+
+@lru_cache(maxsize=1024)
+def _compile_glob(pattern: str) -> Pattern[str]:
+    return re.compile(translate(pattern))
+
 def _is_async(fn: Handler) -> bool:
     return inspect.iscoroutinefunction(fn)
 
+def _simple_fields(input_model: Type[BaseModel]) -> Optional[Dict[str, Any]]:
+    """Map field name -> (type, default) if every field is a plain scalar, else None.
+
+    Fields carrying constraints (ge, max_length, strict, ...) or aliases are not
+    plain: they must go through input_model validation.
+    """
+    out: Dict[str, Any] = {}
+    for fname, f in input_model.model_fields.items():
+        if (
+            f.annotation not in _SIMPLE_TYPES
+            or f.metadata
+            or f.json_schema_extra
+            or f.alias
+            or f.validation_alias
+            or f.default_factory is not None
+        ):
+            return None
+        out[fname] = (f.annotation, _MISSING if f.is_required() else f.default)
+    return out
+
+def _bind_simple(fields: Dict[str, Any], args: dict) -> Optional[dict]:
+    """Bind already well-typed args directly; None means "let pydantic decide"."""
+    kwargs: Dict[str, Any] = {}
+    for fname, (ann, default) in fields.items():
+        v = args.get(fname, _MISSING)
+        if v is _MISSING:
+            if default is _MISSING:
+                return None
+            kwargs[fname] = default
+        elif type(v) is ann:
+            kwargs[fname] = v
+        elif ann is float and type(v) is int:
+            kwargs[fname] = float(v)
+        else:
+            return None
+    return kwargs
+
+Invoker = Callable[[dict, Principal], Awaitable[Any]]
+
+def _make_invoker(
+    fn: Handler,
+    *,
+    is_async: bool,
+    inject_as: Optional[str],
+    input_model: Type[BaseModel],
+    simple_fields: Optional[Dict[str, Any]],
+) -> Invoker:
+    """Build the per-tool call path once, so call() has nothing left to decide."""
+
+    def bind(args: dict) -> dict:
+        # Fast path: scalar-only tools whose args already have the declared types
+        kwargs = _bind_simple(simple_fields, args) if simple_fields is not None else None
+        if kwargs is None:
+            try:
+                parsed = input_model(**args)
+            except ValidationError as e:
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors())
+            kwargs = dict(parsed.model_dump())
+        return kwargs
+
+    if is_async and inject_as:
+        async def invoke(args: dict, principal: Principal) -> Any:
+            kwargs = bind(args)
+            kwargs[inject_as] = principal
+            return await fn(**kwargs)
+    elif is_async:
+        async def invoke(args: dict, principal: Principal) -> Any:
+            return await fn(**bind(args))
+    elif inject_as:
+        async def invoke(args: dict, principal: Principal) -> Any:
+            kwargs = bind(args)
+            kwargs[inject_as] = principal
+            return fn(**kwargs)
+    else:
+        async def invoke(args: dict, principal: Principal) -> Any:
+            return fn(**bind(args))
+    return invoke
+
 @dataclass(frozen=True)
 class ToolDef:
     name: str
     description: str
     fn: Handler
     input_model: Type[BaseModel]
-    output_model: Type[BaseModel]
     required_caps: List[str]
     tags: List[str]
+    input_schema: Dict[str, Any]
+    docstring: str
+    # Everything that authorizes a call: required caps, then tag:<tag> for each tag.
+    grants: Tuple[str, ...]
+    literal_grants: FrozenSet[str]
+    invoke: Invoker
 
 class ToolRegistry:
     def __init__(self) -> None:
         self._tools: Dict[str, ToolDef] = {}
+        self._list_tools_cache: Optional[bytes] = None
 
     def list(self) -> List[ToolDef]:
         return list(self._tools.values())
 
+    def list_tools_json(self) -> bytes:
+        """JSON body for /mcp/list_tools, rebuilt only after the registry changes."""
+        if self._list_tools_cache is None:
+            self._list_tools_cache = orjson.dumps(
+                [{"name": t.name, "description": t.description} for t in self._tools.values()]
+            )
+        return self._list_tools_cache
+
     def get(self, name: str) -> ToolDef:
         return self._tools[name]
 
@@ -44,24 +149,26 @@ class ToolRegistry:
         tags: Optional[List[str]] = None,
     ) -> ToolDef:
         tool_name = name or fn.__name__
-        desc = description or (fn.__doc__ or "").strip() or f"Tool {tool_name}"
+        desc = (description or fn.__doc__ or "").strip() or f"Tool {tool_name}"
 
         # Build input model from signature
         sig = inspect.signature(fn)
         hints = get_type_hints(fn)
-        fields: Dict[str, Any] = {}
 
-        for pname, p in sig.parameters.items():
-            if pname == "user":
-                continue
-            ann = hints.get(pname, Any)
-            default = ... if p.default is inspect._empty else p.default
-            fields[pname] = (ann, default)
+        # Inject principal if the function accepts it (back compat: parameter name 'user' too)
+        inject_as: Optional[str] = None
+        if "principal" in sig.parameters:
+            inject_as = "principal"
+        elif "user" in sig.parameters:
+            inject_as = "user"
 
-        input_model = create_model(f"{tool_name}_Input", **fields)  # type: ignore[arg-type]
+        fields: Dict[str, Any] = {
+            pname: (hints.get(pname, Any), ... if p.default is inspect._empty else p.default)
+            for pname, p in sig.parameters.items()
+            if pname != inject_as
+        }
 
-        # Wrap output value
-        output_model = create_model(f"{tool_name}_Output", value=(Any, ...))  # type: ignore[arg-type]
+        input_model = create_model(f"{tool_name}_Input", **fields)  # type: ignore[arg-type]
 
         # Authorization metadata
         req: List[str] = []
@@ -72,72 +179,61 @@ class ToolRegistry:
             req = [f"tool:{tool_name}"]
 
         tool_tags = list(tags or [])
+        grants = tuple(req) + tuple(f"tag:{tag}" for tag in tool_tags)
 
         t = ToolDef(
             name=tool_name,
             description=desc,
             fn=fn,
             input_model=input_model,
-            output_model=output_model,
             required_caps=req,
             tags=tool_tags,
+            input_schema=input_model.model_json_schema(),
+            docstring=fn.__doc__ or "",
+            grants=grants,
+            literal_grants=frozenset(g for g in grants if not is_glob(g)),
+            invoke=_make_invoker(
+                fn,
+                is_async=_is_async(fn),
+                inject_as=inject_as,
+                input_model=input_model,
+                simple_fields=_simple_fields(input_model),
+            ),
         )
         self._tools[tool_name] = t
+        self._list_tools_cache = None
         return t
 
     def _principal_has(self, principal: Principal, required: str) -> bool:
-        # Expand tool tags into virtual required caps: tag:<tag>
-        # Caller side patterns are supported (fnmatch semantics).
-        for cap in principal.capabilities:
-            if cap == "*" or cap == "admin:*":
-                return True
-            if fnmatch(required, cap) or fnmatch(cap, required):
-                return True
+        # Caller side patterns are supported (fnmatch semantics), and so are
+        # tool side ones: a required "tool:secret:*" accepts "tool:secret:x".
+        if principal.caps.matches(required):
+            return True
+        if is_glob(required):
+            rx = _compile_glob(required)
+            return any(rx.match(cap) for cap in principal.capabilities)
         return False
 
     def authorize_action(self, principal: Principal, action: str) -> None:
         # action is something like tools:list, tools:search, tools:get, tools:call
         if self._principal_has(principal, action):
             return
-        from fastapi import HTTPException, status
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Missing capability: {action}")
 
     def enforce_tool(self, principal: Principal, tool: ToolDef) -> None:
-        from fastapi import HTTPException, status
-
-        # required caps
-        for req in tool.required_caps:
-            if self._principal_has(principal, req):
-                return
+        caps = principal.caps
+        if caps.is_admin or not caps.literals.isdisjoint(tool.literal_grants):
+            return
 
-        # tag caps (tag:<tag>)
-        for tag in tool.tags:
-            if self._principal_has(principal, f"tag:{tag}"):
-                return
+        # Only glob patterns (on either side) can still grant access.
+        if caps.glob is not None or len(tool.literal_grants) < len(tool.grants):
+            for grant in tool.grants:
+                if self._principal_has(principal, grant):
+                    return
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized for this tool")
 
     async def call(self, tool: ToolDef, *, args: dict, principal: Principal) -> dict:
-        # Validate
-        try:
-            parsed = tool.input_model(**args)
-        except ValidationError as e:
-            from fastapi import HTTPException, status
-            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors())
-
-        # Inject principal if the function accepts it (back compat: parameter name 'user' too)
-        sig = inspect.signature(tool.fn)
-        kwargs = dict(parsed.model_dump())
-        if "principal" in sig.parameters:
-            kwargs["principal"] = principal
-        elif "user" in sig.parameters:
-            kwargs["user"] = principal  # type: ignore[assignment]
-
-        # Call
-        if _is_async(tool.fn):
-            value = await tool.fn(**kwargs)  # type: ignore[misc]
-        else:
-            value = tool.fn(**kwargs)
-
-        out = tool.output_model(value=value)
-        return out.model_dump()
+        value = await tool.invoke(args, principal)
+        # Results are wrapped as {"value": ...}; there is nothing to validate on an Any field.
+        return {"value": value}
@@ -1,7 +1,13 @@
 from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 
 from .app import auth_router, build_mcp_router
+from .auth import flush_api_key_store
 from .registry import ToolRegistry
 from .decorators import get_registry
 
@@ -12,7 +18,16 @@ def create_app(
 ) -> FastAPI:
     reg = registry or get_registry()
 
-    app = FastAPI(title="dynamic-MCP (capability tokens)")
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        yield
+        # Persist last_used_at updates still buffered by the API key store.
+        await asyncio.to_thread(flush_api_key_store)
+
+    app = FastAPI(title="dynamic-MCP (capability tokens)", lifespan=lifespan)
+    # Large bodies (e.g. list_tools on big servers) are compressed for clients that accept it.
+    # Level 1: these responses are latency-sensitive, and most of gzip's gain comes at the fastest level.
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=1)
     app.include_router(auth_router)
     app.include_router(build_mcp_router(reg, server_name=server_name, server_description=server_description))
 
@@ -13,6 +13,10 @@ How to run:
 
    uvicorn basic_server:app --reload
 
+   or, for a client on the same host (client_agent.py --mcp-uds /tmp/dynamic-mcp.sock):
+
+   uvicorn basic_server:app --uds /tmp/dynamic-mcp.sock
+
 3) Mint a demo key (printed once at startup) or mint your own:
 
    The demo prints a key to stdout on first start. Export it for the client:
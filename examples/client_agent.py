@@ -3,37 +3,127 @@
 dynamic-mcp autonomous agent demo (LangChain OpenAI client)
 
 This version uses `langchain_openai.ChatOpenAI` (OpenAI-style tool calling) instead of Ollama.
+Requires: langchain-openai, python-dotenv, httpx[http2].
 
-It still enforces the same rule:
+By default the model only sees tool names and descriptions, and follows the
+just-in-time flow:
 1) call `get_tool(name)` to fetch the tool's schema
 2) then call `call_tool(name, arguments)` with args that match that schema
+
+With `--inline-schemas`, every schema is fetched up front and compact argument
+signatures are listed in the prompt, so the model can usually go straight to
+`call_tool` (trading prompt tokens for fewer round trips).
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import os
-from typing import Any, Dict, List, Optional
-
-import requests
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import (
-    AIMessage,
-    HumanMessage,
-    SystemMessage,
-    ToolMessage,
-)
+import random
+import time
+from collections import OrderedDict
+from fnmatch import fnmatch
+from functools import lru_cache
+from hashlib import blake2b
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import httpx
 from textwrap import dedent
 
+# langchain is imported inside the functions that use it, so `--help` and
+# argument errors don't pay for loading it.
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
 from dotenv import load_dotenv
 load_dotenv()
 
+def _json_dumps_std(obj: Any, *, sort_keys: bool = False) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":"))
+
+# orjson is much faster for the per-tool-call serialization below; the stdlib
+# fallback produces the same compact, UTF-8 (non-ASCII-escaped) output, and also
+# handles what orjson rejects (integers wider than 64 bits).
+try:
+    import orjson
+
+    def json_dumps(obj: Any, *, sort_keys: bool = False) -> str:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0).decode()
+        except TypeError:
+            return _json_dumps_std(obj, sort_keys=sort_keys)
+except ImportError:
+    json_dumps = _json_dumps_std
+
+# Parsing stays on the stdlib: orjson silently turns integers wider than 64 bits
+# into floats, which would corrupt tool results and arguments.
+json_loads = json.loads
+
 # -----------------------------
 # dynamic-mcp HTTP client
 # -----------------------------
+# Server tools whose results may be reused for identical arguments (besides
+# tools whose schema declares "idempotent": true).
+CACHEABLE_TOOL_PATTERNS = ("get_*", "list_*", "read_*")
+CALL_CACHE_MAXSIZE = 1024
+CALL_CACHE_TTL_S = 300.0
+# Host used in request URLs when talking over a Unix domain socket.
+UDS_BASE_URL = "http://localhost"
+
+# Only advertise encodings httpx can actually decode here (its default header
+# lists zstd even when the `zstandard` package is missing).
+try:
+    import zstandard  # noqa: F401
+
+    ACCEPT_ENCODING = "zstd, gzip"
+except ImportError:
+    ACCEPT_ENCODING = "gzip"
+
+# Bounded, jittered retries for the read-only endpoints (list_tools, get_tool)
+# on gateway errors and dropped connections. call_tool is never retried: the
+# tool may already have run.
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF_S = 0.2
+RETRY_JITTER_S = 0.1
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+def stable_digest(*parts: str) -> str:
+    """Short blake2b digest of `parts`; unlike hash(), identical across processes and runs."""
+    h = blake2b(digest_size=8)
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after `ttl_s` seconds."""
+
+    def __init__(self, maxsize: int, ttl_s: float):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl_s, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
 class DynamicMCPClient:
-    """Tiny HTTP client for dynamic-mcp.
+    """Tiny async HTTP client for dynamic-mcp.
 
     Default server auth mode is **apikey** (opaque bearer token).
     So the client simply sends:
@@ -41,12 +131,40 @@ class DynamicMCPClient:
         Authorization: Bearer <API_KEY>
 
     There is no login flow.
+
+    Requests go through one pooled `httpx.AsyncClient` (HTTP/2 where the server
+    offers it), so concurrent tool calls share connections. Use it as an async
+    context manager (or call `aclose()`) to release them.
     """
 
-    def __init__(self, base_url: str, api_key: str, timeout_s: float = 30.0):
+    def __init__(self, base_url: str, api_key: str, timeout_s: float = 30.0, uds: Optional[str] = None):
+        # A co-located server can be reached over a Unix domain socket, either via
+        # `unix:///path/to.sock` as the base URL or via `uds` (which falls back to
+        # `base_url` over TCP when the socket does not exist).
+        if base_url.startswith("unix://"):
+            uds, base_url = base_url[len("unix://"):], UDS_BASE_URL
+        elif uds and not os.path.exists(uds):
+            uds = None
+        elif uds:
+            base_url = UDS_BASE_URL
         self.base_url = base_url.rstrip("/")
+        self.uds = uds
         self.api_key = api_key
         self.timeout_s = timeout_s
+        self._client: Optional[httpx.AsyncClient] = None
+        self._schema_cache: Dict[str, Dict[str, Any]] = {}
+        self._call_cache = TTLCache(CALL_CACHE_MAXSIZE, CALL_CACHE_TTL_S)
+
+    async def __aenter__(self) -> "DynamicMCPClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     @property
     def headers(self) -> Dict[str, str]:
@@ -54,82 +172,362 @@ class DynamicMCPClient:
             raise RuntimeError(
                 "Missing API key. Provide --api-key or set DYNAMIC_MCP_API_KEY."
             )
-        return {"Authorization": f"Bearer {self.api_key}"}
+        return {"Authorization": f"Bearer {self.api_key}", "Accept-Encoding": ACCEPT_ENCODING}
 
-    def list_tools(self) -> List[Dict[str, Any]]:
-        url = f"{self.base_url}/mcp/list_tools"
-        resp = requests.get(url, headers=self.headers, timeout=self.timeout_s)
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            transport = httpx.AsyncHTTPTransport(
+                uds=self.uds,
+                http2=True,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+                retries=2,  # connection failures only
+            )
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout_s,
+                transport=transport,
+            )
+        return self._client
+
+    async def _request_idempotent(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        for attempt in range(RETRY_ATTEMPTS + 1):
+            try:
+                resp = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == RETRY_ATTEMPTS:
+                    raise
+            else:
+                if resp.status_code not in RETRY_STATUSES or attempt == RETRY_ATTEMPTS:
+                    resp.raise_for_status()
+                    return resp
+            await asyncio.sleep(RETRY_BACKOFF_S * 2 ** attempt + random.uniform(0, RETRY_JITTER_S))
+        raise AssertionError("unreachable")
+
+    async def list_tools(self) -> List[Dict[str, Any]]:
+        resp = await self._request_idempotent("GET", "/mcp/list_tools")
+        return json_loads(resp.content)
+
+    async def get_tool(self, name: str) -> Dict[str, Any]:
+        cached = self._schema_cache.get(name)
+        if cached is not None:
+            return cached
+        resp = await self._request_idempotent("POST", "/mcp/get_tool", json={"name": name})
+        schema = self._schema_cache[name] = json_loads(resp.content)
+        return schema
+
+    async def prefetch_schemas(self, tool_list: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Fetch every listed tool's schema concurrently to prime the cache (best effort).
+
+        Returns the schemas that could be fetched, keyed by tool name.
+        """
+        await asyncio.gather(*(self.get_tool(t["name"]) for t in tool_list), return_exceptions=True)
+        return {t["name"]: self._schema_cache[t["name"]] for t in tool_list if t["name"] in self._schema_cache}
+
+    def _is_cacheable(self, name: str) -> bool:
+        if self._schema_cache.get(name, {}).get("idempotent") is True:
+            return True
+        return any(fnmatch(name, pat) for pat in CACHEABLE_TOOL_PATTERNS)
+
+    async def call_tool(
+        self, name: str, arguments: Dict[str, Any], *, idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run a server tool. Never retried, since the tool may already have run.
+
+        `idempotency_key` should identify this one call (e.g. the model's
+        tool_call_id), so a server that de-duplicates on it never drops a
+        separate call that happens to have the same arguments.
+        """
+        key = None
+        if self._is_cacheable(name):
+            key = (name, json_dumps(arguments, sort_keys=True))
+            cached = self._call_cache.get(key)
+            if cached is not None:
+                return cached
+        resp = await self.client.post(
+            "/mcp/call_tool",
+            json={"name": name, "arguments": arguments},
+            headers={"X-Idempotency-Key": idempotency_key} if idempotency_key else None,
+        )
         resp.raise_for_status()
-        return resp.json()
+        result = json_loads(resp.content)
+        if key is not None:
+            self._call_cache.set(key, result)
+        return result
+
+# Per-tool budget for the inlined argument signature; longer ones are left
+# for the model to fetch with get_tool.
+MAX_TOOL_SIGNATURE_TOKENS = 64
+
+def _schema_type(prop: Dict[str, Any]) -> str:
+    if "anyOf" in prop:
+        return " | ".join(_schema_type(p) for p in prop["anyOf"])
+    t = prop.get("type", "any")
+    if t == "array" and isinstance(prop.get("items"), dict):
+        return f"array[{_schema_type(prop['items'])}]"
+    return t
+
+def format_signature(schema: Dict[str, Any]) -> str:
+    input_schema = schema.get("input_schema") or {}
+    required = set(input_schema.get("required") or [])
+    params = [
+        f"{pname}{'' if pname in required else '?'}: {_schema_type(prop)}"
+        for pname, prop in (input_schema.get("properties") or {}).items()
+    ]
+    return f"({', '.join(params)})"
 
-    def get_tool(self, name: str) -> Dict[str, Any]:
-        url = f"{self.base_url}/mcp/get_tool"
-        resp = requests.post(url, headers=self.headers, json={"name": name}, timeout=self.timeout_s)
-        resp.raise_for_status()
-        return resp.json()
+def token_counter(model: str) -> Callable[[str], int]:
+    """Token counter for `model`.
 
-    def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        url = f"{self.base_url}/mcp/call_tool"
-        resp = requests.post(url, headers=self.headers, json={"name": name, "arguments": arguments}, timeout=self.timeout_s)
-        resp.raise_for_status()
-        return resp.json()
+    Falls back to a ~4 characters/token estimate when tiktoken (or the encoding
+    files it downloads on first use) is unavailable.
+    """
+    try:
+        import tiktoken
 
-def extract_arguments(args_json: Dict[str, Any]) -> Dict[str, Any]:
-    if 'arguments' in args_json:
-        return args_json['arguments']
-    elif 'parameters' in args_json:
-        return args_json['parameters']
-    else:
-        return {}
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return lambda text: len(text) // 4 + 1
+    return lambda text: len(enc.encode(text))
 
 def format_tool_menu(tool_list: List[Dict[str, Any]]) -> str:
-    lines = ["Available tools (name — description):"]
-    for t in tool_list:
-        lines.append(f"- {t['name']} — {t.get('description','')}".strip())
-    return "\n".join(lines)
+    # Descriptions arrive stripped from the server.
+    return "Available server tools (name — description):\n" + "\n".join(
+        f"- {t['name']} — {t.get('description', '')}" for t in tool_list
+    )
+
+def format_tool_catalog(
+    tool_list: List[Dict[str, Any]],
+    schemas: Dict[str, Dict[str, Any]],
+    count_tokens: Callable[[str], int],
+) -> str:
+    def signature(name: str) -> str:
+        schema = schemas.get(name)
+        sig = format_signature(schema) if schema else ""
+        if not sig or count_tokens(sig) > MAX_TOOL_SIGNATURE_TOKENS:
+            return "(...) [schema omitted: call get_tool first]"
+        return sig
+
+    # Descriptions arrive stripped from the server.
+    return "Available server tools (name(arguments) — description; `?` marks optional arguments):\n" + "\n".join(
+        f"- {t['name']}{signature(t['name'])} — {t.get('description', '')}" for t in tool_list
+    )
 
 
 # -----------------------------
-# Explicit OpenAI tool schemas
+# System prompt
 # -----------------------------
-OPENAI_TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_tool",
-            "description": "Fetch the full schema/spec for a tool by name from dynamic-mcp.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "name": {"type": "string", "description": "Tool name to retrieve schema for"}
-                },
-                "required": ["name"],
+# Kept free of interpolation so it is a byte-identical prefix on every request
+# (and therefore eligible for provider-side prompt caching). The server's tool
+# menu is sent in a separate system message after it.
+SYSTEM_PROMPT = dedent("""
+    You are an autonomous agent that can call tools exposed by a dynamic-mcp server.
+
+    Available tools you can directly call:
+    - get_tool — Fetch the full schema/spec for a tool by name
+    - call_tool — Execute a tool by name with arguments matching its schema
+
+    The server's own tools are listed in the next system message.
+
+    RULES:
+    1. To use any server tool, FIRST call `get_tool(name)` to fetch its schema
+    2. Read the `input_schema` from the response carefully
+    3. Construct arguments that exactly match the schema
+    4. THEN call `call_tool(name, arguments)` with those arguments
+    5. The way to give the tool_call arguments is to provide the "arguments" key in the json, not the "parameters" key.
+
+    EXAMPLE:
+    - get_tool({"name": "add"}) returns an input_schema with properties "a" and "b" (numbers)
+    - then call_tool({"name": "add", "arguments": {"a": 2, "b": 3}})
+
+    IMPORTANT: You can ONLY directly call `get_tool` and `call_tool`.
+    You cannot directly call the server tools (add, multiply, etc).
+    You must use get_tool and call_tool to interact with them.
+
+    Your job is to decide which server tool to use and call it correctly.
+""").strip()
+
+# Used with --inline-schemas, where the tool menu includes argument signatures.
+SYSTEM_PROMPT_INLINE = dedent("""
+    You are an autonomous agent that can call tools exposed by a dynamic-mcp server.
+
+    Available tools you can directly call:
+    - get_tool — Fetch the full schema/spec for a tool by name
+    - call_tool — Execute a tool by name with arguments matching its schema
+
+    The server's own tools are listed in the next system message, with their argument signatures.
+
+    RULES:
+    1. If the signature shown for a server tool is sufficient, you MAY call `call_tool` directly without calling `get_tool` first
+    2. If the schema is omitted, or you need the tool's full documentation, FIRST call `get_tool(name)` and read its `input_schema` carefully
+    3. Construct arguments that exactly match the schema
+    4. Call `call_tool(name, arguments)` with those arguments
+    5. The way to give the tool_call arguments is to provide the "arguments" key in the json, not the "parameters" key.
+
+    EXAMPLE:
+    - the listing shows `add(a: number, b: number)`
+    - call_tool({"name": "add", "arguments": {"a": 2, "b": 3}})
+
+    IMPORTANT: You can ONLY directly call `get_tool` and `call_tool`.
+    You cannot directly call the server tools (add, multiply, etc).
+    You must use get_tool and call_tool to interact with them.
+
+    Your job is to decide which server tool to use and call it correctly.
+""").strip()
+
+
+# -----------------------------
+# Client-side tools exposed to the model
+# -----------------------------
+# One entry per tool: how to run it, and its OpenAI function schema.
+# OPENAI_TOOLS is derived from these so the two never drift.
+# Handlers get the client, the call's arguments and the model's tool_call_id (or None).
+DISPATCH: Dict[str, Callable[[DynamicMCPClient, Dict[str, Any], Optional[str]], Awaitable[Any]]] = {
+    "get_tool": lambda mcp, a, call_id: mcp.get_tool(a["name"]),
+    # Some models send the tool's arguments as "parameters" instead.
+    "call_tool": lambda mcp, a, call_id: mcp.call_tool(
+        a["name"], a.get("arguments") or a.get("parameters") or {}, idempotency_key=call_id
+    ),
+}
+
+SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "get_tool": {
+        "description": "Fetch the full schema/spec for a tool by name from dynamic-mcp.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "description": "Tool name to retrieve schema for"}
             },
+            "required": ["name"],
         },
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "call_tool",
-            "description": "Execute a tool on dynamic-mcp by name with JSON arguments (must match schema).",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "name": {"type": "string", "description": "Tool name to execute"},
-                    "arguments": {"type": "object", "description": "Arguments object for the tool"},
-                },
-                "required": ["name", "arguments"],
+    "call_tool": {
+        "description": "Execute a tool on dynamic-mcp by name with JSON arguments (must match schema).",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "description": "Tool name to execute"},
+                "arguments": {"type": "object", "description": "Arguments object for the tool"},
             },
+            "required": ["name", "arguments"],
         },
     },
+}
+
+OPENAI_TOOLS = [
+    {"type": "function", "function": {"name": name, **SCHEMAS[name]}} for name in DISPATCH
 ]
 
 
-def main() -> None:
+@lru_cache(maxsize=8)
+def _get_llm(model: str) -> Any:
+    """ChatOpenAI bound to OPENAI_TOOLS, built once per model.
+
+    The underlying HTTP connection pool is langchain-openai's process-wide default.
+    """
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=model, temperature=0).bind_tools(OPENAI_TOOLS)
+
+
+# Number of most recent assistant tool-call turns kept verbatim in the context;
+# older ones are folded into a one-line-per-call summary.
+MESSAGE_WINDOW_TURNS = 4
+COMPACTED_HEADER = "[Compacted earlier tool calls]"
+COMPACTED_PREVIEW_CHARS = 200
+
+def compact_messages(messages: List[Any], window: int = MESSAGE_WINDOW_TURNS) -> List[Any]:
+    """Bound context growth by summarizing all but the last `window` tool-call turns.
+
+    A turn is an assistant message plus the ToolMessages answering it; turns are
+    dropped whole so every remaining tool result still follows its tool call.
+    """
+    from langchain_core.messages import AIMessage, SystemMessage
+
+    first_ai = next((i for i, m in enumerate(messages) if isinstance(m, AIMessage)), len(messages))
+    head, turns = list(messages[:first_ai]), []
+    for m in messages[first_ai:]:
+        if isinstance(m, AIMessage):
+            turns.append([m])
+        else:
+            turns[-1].append(m)
+    if len(turns) <= window:
+        return messages
+
+    lines: List[str] = []
+    for ai, *tool_msgs in turns[:-window]:
+        results = {tm.tool_call_id: tm.content for tm in tool_msgs}
+        for tc in ai.tool_calls:
+            result = str(results.get(tc.get("id"), ""))[:COMPACTED_PREVIEW_CHARS]
+            lines.append(f"- {tc['name']} {json_dumps(tc['args'], sort_keys=True)} -> {result}")
+
+    # Fold into the summary left by a previous compaction, if any.
+    if head and isinstance(head[-1], SystemMessage) and head[-1].content.startswith(COMPACTED_HEADER):
+        lines = head.pop().content.splitlines()[1:] + lines
+    head.append(SystemMessage(content="\n".join([COMPACTED_HEADER, *lines])))
+    return head + [m for turn in turns[-window:] for m in turn]
+
+
+async def stream_turn(
+    llm: Any,
+    messages: List[Any],
+    dispatch: Callable[[Dict[str, Any]], Awaitable[ToolMessage]],
+) -> Tuple[AIMessage, List[ToolMessage]]:
+    """Run one assistant turn, dispatching each tool call as soon as it is complete.
+
+    The response is streamed; once a tool call's argument JSON parses, its
+    dispatch starts while the model is still generating the rest. Tool results
+    are returned in the order of the assistant's tool calls.
+    """
+    from langchain_core.messages import AIMessageChunk
+
+    ai: Optional[AIMessageChunk] = None
+    # Keyed by tool-call id (or stream index when the model sent no id).
+    inflight: Dict[Any, "asyncio.Task[ToolMessage]"] = {}
+
+    async for chunk in llm.astream(messages):
+        ai = chunk if ai is None else ai + chunk
+        for pos, tcc in enumerate(ai.tool_call_chunks):
+            key = tcc.get("id") or (pos if tcc.get("index") is None else tcc["index"])
+            if key in inflight or not tcc.get("name"):
+                continue
+            try:
+                call_args = json_loads(tcc.get("args") or "")
+            except ValueError:
+                continue  # arguments still streaming
+            tc = {"name": tcc["name"], "args": call_args, "id": tcc.get("id")}
+            inflight[key] = asyncio.create_task(dispatch(tc))
+
+    if ai is None:
+        ai = AIMessageChunk(content="")
+
+    # Anything whose arguments never parsed while streaming is dispatched now,
+    # from the final (leniently parsed) tool calls.
+    pending: List[Awaitable[ToolMessage]] = []
+    for pos, tc in enumerate(ai.tool_calls):
+        key = tc.get("id") or pos
+        pending.append(inflight.pop(key) if key in inflight else dispatch(tc))
+    for task in inflight.values():
+        task.cancel()
+    results = list(await asyncio.gather(*pending))
+    return ai, results
+
+
+async def main() -> None:
     parser = argparse.ArgumentParser(description="LangChain OpenAI autonomous agent client for dynamic-mcp.")
     parser.add_argument("prompt", type=str, help="User prompt to the agent.")
     parser.add_argument("--model", type=str, default=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), help="OpenAI model name.")
     parser.add_argument("--mcp-base", type=str, default="http://localhost:8000", help="dynamic-mcp server base URL.")
+    parser.add_argument(
+        "--mcp-uds",
+        type=str,
+        default=None,
+        help="Unix domain socket of a co-located dynamic-mcp server (overrides --mcp-base if the socket exists).",
+    )
     parser.add_argument(
         "--api-key",
         type=str,
@@ -137,85 +535,82 @@ def main() -> None:
         help="dynamic-mcp API key (Bearer token). You can also set DYNAMIC_MCP_API_KEY.",
     )
     parser.add_argument("--max-steps", type=int, default=12, help="Maximum tool-call iterations.")
+    parser.add_argument(
+        "--inline-schemas",
+        action="store_true",
+        help="Fetch all tool schemas up front and list their argument signatures in the prompt.",
+    )
     parser.add_argument("--verbose", action="store_true", help="Print tool calls and tool outputs.")
     args = parser.parse_args()
 
-    mcp = DynamicMCPClient(args.mcp_base, args.api_key)
-    tool_list = mcp.list_tools()
+    from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 
-    system = dedent(f"""
-    You are an autonomous agent that can call tools exposed by a dynamic-mcp server.
+    async with DynamicMCPClient(args.mcp_base, args.api_key, uds=args.mcp_uds) as mcp:
+        tool_list = sorted(await mcp.list_tools(), key=lambda t: t["name"])
 
-    Available tools you can directly call:
-    - get_tool — Fetch the full schema/spec for a tool by name
-    - call_tool — Execute a tool by name with arguments matching its schema
+        # Volatile part of the prompt goes last, in a stable order, so the
+        # static system prompt stays a cacheable prefix across runs.
+        if args.inline_schemas:
+            # Inlined into the prompt below; any get_tool calls are answered from cache.
+            schemas = await mcp.prefetch_schemas(tool_list)
+            system_prompt = SYSTEM_PROMPT_INLINE
+            tool_catalog = format_tool_catalog(tool_list, schemas, token_counter(args.model))
+        else:
+            system_prompt = SYSTEM_PROMPT
+            tool_catalog = format_tool_menu(tool_list)
 
-    Available server tools (use get_tool first to understand their schema):
-    {format_tool_menu(tool_list)}
+        llm = _get_llm(args.model)
 
-    RULES:
-    1. To use any server tool, FIRST call `get_tool(name)` to fetch its schema
-    2. Read the `input_schema` from the response carefully
-    3. Construct arguments that exactly match the schema
-    4. THEN call `call_tool(name, arguments)` with those arguments
-    5. The way to give the tool_call arguments is to provide the "arugments" key in the json, not the "parameters" key.
-
-    IMPORTANT: You can ONLY directly call `get_tool` and `call_tool`. 
-    You cannot directly call the server tools (add, multiply, etc).
-    You must use get_tool and call_tool to interact with them.
+        messages = [
+            SystemMessage(content=system_prompt),
+            SystemMessage(content=tool_catalog),
+            HumanMessage(content=args.prompt),
+        ]
 
-    Your job is to decide which server tool to use and call it correctly.
-    """.strip())
-
-    llm = ChatOpenAI(
-        model=args.model,
-        temperature=0,
-    ).bind_tools(OPENAI_TOOLS)
-
-    messages = [
-        SystemMessage(content=system),
-        HumanMessage(content=args.prompt),
-    ]
-
-    for _ in range(args.max_steps):
-        ai: AIMessage = llm.invoke(messages)
-        messages.append(ai)
-
-        tool_calls = getattr(ai, "tool_calls", None) or []
-        if not tool_calls:
-            print((ai.content or "").strip())
-            return
-
-        for tc in tool_calls:
+        async def dispatch(tc: Dict[str, Any]) -> ToolMessage:
             name = tc.get("name")
             args_json = tc.get("args") or {}
-            call_id = tc.get("id") or tc.get("tool_call_id") or ""
+            model_call_id = tc.get("id") or tc.get("tool_call_id") or None
+            call_id = model_call_id or ""
+            payload: Optional[str] = None
 
-            # If the model/tooling didn't provide an id (rare), generate a stable-ish one
+            # If the model/tooling didn't provide an id (rare), derive a stable one
             # to avoid OpenAI API errors about missing tool_call_id.
             if not call_id:
-                call_id = f"tc_{abs(hash((name, json.dumps(args_json, sort_keys=True))))}"
+                payload = json_dumps(args_json, sort_keys=True)
+                call_id = f"tc_{stable_digest(name or '', payload)}"
 
             if args.verbose:
-                print(f"[tool_call] {name} {json.dumps(args_json, ensure_ascii=False)}")
-
-            if name == "get_tool":
-                result = mcp.get_tool(args_json["name"])
-            elif name == "call_tool":
-                arguments = extract_arguments(args_json)
-                result = mcp.call_tool(args_json["name"], arguments)
+                if payload is None:
+                    payload = json_dumps(args_json, sort_keys=True)
+                print(f"[tool_call] {name} {payload}")
+
+            handler = DISPATCH.get(name)
+            if handler is not None:
+                # Synthesized ids are not unique per call, so they are not passed on.
+                result = await handler(mcp, args_json, model_call_id)
             else:
                 result = {"error": f"Unknown tool: {name}"}
 
+            content = json_dumps(result)
             if args.verbose:
-                print(f"[tool_result] {name} {json.dumps(result, ensure_ascii=False)}")
+                print(f"[tool_result] {name} {content}")
 
-            messages.append(
-                ToolMessage(content=json.dumps(result, ensure_ascii=False), tool_call_id=call_id)
-            )
+            return ToolMessage(content=content, tool_call_id=call_id)
+
+        for _ in range(args.max_steps):
+            ai, results = await stream_turn(llm, messages, dispatch)
+            messages.append(ai)
+
+            if not ai.tool_calls:
+                print((ai.content or "").strip())
+                return
+
+            messages.extend(results)
+            messages = compact_messages(messages)
 
-    print("Stopped: reached max steps without a final non-tool response. Try increasing --max-steps.")
+        print("Stopped: reached max steps without a final non-tool response. Try increasing --max-steps.")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())